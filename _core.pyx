@@ -0,0 +1,65 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+C versions of the search kernels in _core_nb (win detection and the
+heuristic), compiled ahead of time so there is no JIT warm-up on the first
+AI move. Build in place with `python setup.py build_ext --inplace`;
+connect_four_ai_core falls back to _core_nb when this module is missing.
+"""
+
+cdef extern from *:
+    int __builtin_popcountll(unsigned long long x) nogil
+
+cdef enum:
+    COLUMN_HEIGHT = 7 # six rows plus the sentinel row of the bitboard layout
+    WINDOW_LENGTH = 4
+
+cpdef bint has_four(long long bb):
+    """Checks a single player's bitboard for 4-in-a-row."""
+    cdef long long m = bb & (bb >> COLUMN_HEIGHT)
+    if m & (m >> (2 * COLUMN_HEIGHT)): return True
+    m = bb & (bb >> (COLUMN_HEIGHT - 1))
+    if m & (m >> (2 * (COLUMN_HEIGHT - 1))): return True
+    m = bb & (bb >> (COLUMN_HEIGHT + 1))
+    if m & (m >> (2 * (COLUMN_HEIGHT + 1))): return True
+    m = bb & (bb >> 1)
+    return (m & (m >> 2)) != 0
+
+cpdef bint made_win(long long bb, int pos):
+    """Checks only the lines through bit pos of bb for 4-in-a-row."""
+    cdef long long bit = 1LL << pos
+    cdef long long b
+    cdef int shift, count
+    # Vertical, horizontal and both diagonals, as bit distances between neighbours
+    for shift in (1, COLUMN_HEIGHT, COLUMN_HEIGHT - 1, COLUMN_HEIGHT + 1):
+        count = 1
+        b = bit << shift
+        while count < 4 and bb & b:
+            count += 1
+            b <<= shift
+        b = bit >> shift
+        while count < 4 and bb & b:
+            count += 1
+            b >>= shift
+        if count >= 4:
+            return True
+    return False
+
+cpdef long long score_position(long long own, long long opp, const long long[::1] windows,
+                               const long long[::1] window_scores, long long center_mask,
+                               long long center_weight):
+    """
+    Scores the bitboards own / opp over every window mask in windows, looking
+    each window up in connect_four_ai_core.WINDOW_SCORES (window_scores).
+    """
+    cdef long long score = __builtin_popcountll(own & center_mask) * center_weight
+    cdef Py_ssize_t i
+    cdef long long mask, own_bits, opp_bits
+    for i in range(windows.shape[0]):
+        mask = windows[i]
+        own_bits = own & mask
+        opp_bits = opp & mask
+        if own_bits and opp_bits:
+            continue # A window holding both colors can never score
+        score += window_scores[__builtin_popcountll(own_bits) * (WINDOW_LENGTH + 1)
+                               + __builtin_popcountll(opp_bits)]
+    return score
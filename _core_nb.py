@@ -0,0 +1,84 @@
+"""
+Numba-compiled kernels for the search hot path (win detection and the
+heuristic), working directly on the bitboards of connect_four_ai_core.
+Window masks and the window score table are passed as int64 arrays, so
+the heuristic weights are only defined in connect_four_ai_core. Without Numba installed the
+functions still run as plain Python, but connect_four_ai_core then scores
+positions with int.bit_count() instead.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit that leaves the function uncompiled."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+COLUMN_HEIGHT = 7 # six rows plus the sentinel row of the bitboard layout
+WINDOW_LENGTH = 4
+
+@njit(cache=True)
+def has_four(bb):
+    """Checks a single player's bitboard for 4-in-a-row."""
+    m = bb & (bb >> COLUMN_HEIGHT)
+    if m & (m >> (2 * COLUMN_HEIGHT)): return True
+    m = bb & (bb >> (COLUMN_HEIGHT - 1))
+    if m & (m >> (2 * (COLUMN_HEIGHT - 1))): return True
+    m = bb & (bb >> (COLUMN_HEIGHT + 1))
+    if m & (m >> (2 * (COLUMN_HEIGHT + 1))): return True
+    m = bb & (bb >> 1)
+    return (m & (m >> 2)) != 0
+
+@njit(cache=True)
+def made_win(bb, pos):
+    """Checks only the lines through bit pos of bb for 4-in-a-row."""
+    bit = 1 << pos
+    # Vertical, horizontal and both diagonals, as bit distances between neighbours
+    for shift in (1, COLUMN_HEIGHT, COLUMN_HEIGHT - 1, COLUMN_HEIGHT + 1):
+        count = 1
+        b = bit << shift
+        while count < 4 and bb & b:
+            count += 1
+            b <<= shift
+        b = bit >> shift
+        while count < 4 and bb & b:
+            count += 1
+            b >>= shift
+        if count >= 4:
+            return True
+    return False
+
+@njit(cache=True)
+def popcount(x):
+    """Counts the set bits of x."""
+    n = 0
+    while x:
+        x &= x - 1
+        n += 1
+    return n
+
+@njit(cache=True)
+def score_position(own, opp, windows, window_scores, center_mask, center_weight):
+    """
+    Scores the bitboards own / opp over every window mask in windows, looking
+    each window up in connect_four_ai_core.WINDOW_SCORES (window_scores).
+    """
+    score = popcount(own & center_mask) * center_weight
+    for mask in windows:
+        own_bits = own & mask
+        opp_bits = opp & mask
+        if own_bits and opp_bits:
+            continue # A window holding both colors can never score
+        score += window_scores[popcount(own_bits) * (WINDOW_LENGTH + 1) + popcount(opp_bits)]
+    return score
+
+# Compile at import time so the first AI move doesn't pay for it
+has_four(0)
+made_win(0, 0)
+score_position(0, 0, np.zeros(1, dtype=np.int64), np.zeros((WINDOW_LENGTH + 1) ** 2, dtype=np.int64), 0, 0)
@@ -0,0 +1,57 @@
+"""
+Precomputes the AI's first two moves and writes them to opening.pkl, which
+connect_four_ai_core loads as its opening book.
+
+The human always moves first, so the book covers every position after the
+human's first move, and every position after the human's second move that
+follows the book's own first reply. Each position is searched exactly as
+the app would search it at its SEARCH_DEPTH, so the book only saves time and
+never changes a move; rebuild it whenever SEARCH_DEPTH or the heuristic
+changes. Run with `python build_opening_book.py`.
+"""
+import pickle
+
+from connect_four_ai_core import (
+    search_root, create_board, drop_piece, undo_piece, get_next_open_row,
+    get_valid_locations, OPENING_BOOK_PATH, AI_PIECE, PLAYER_PIECE
+)
+from connect_four_app import SEARCH_DEPTH
+
+def book_entry(board, tt):
+    """
+    Searches the position with iterative deepening, as the app does; tt
+    stands in for the game's session transposition table.
+    """
+    for depth in range(1, SEARCH_DEPTH + 1):
+        col, value = search_root(board, depth, AI_PIECE, tt)
+    return col, value
+
+def play(board, col, piece):
+    """Drops piece into col and returns the row it landed on."""
+    row = get_next_open_row(board, col)
+    drop_piece(board, row, col, piece)
+    return row
+
+def main():
+    board = create_board()
+    moves = {}
+    for first in get_valid_locations(board):
+        first_row = play(board, first, PLAYER_PIECE)
+        # A new game starts with an empty table, which its first search fills
+        tt = {}
+        reply, value = moves[(board[0], board[1])] = book_entry(board, tt)
+        reply_row = play(board, reply, AI_PIECE)
+        for second in get_valid_locations(board):
+            second_row = play(board, second, PLAYER_PIECE)
+            moves[(board[0], board[1])] = book_entry(board, dict(tt))
+            undo_piece(board, second_row, second, PLAYER_PIECE)
+        undo_piece(board, reply_row, reply, AI_PIECE)
+        undo_piece(board, first_row, first, PLAYER_PIECE)
+        print(f"Column {first + 1}: reply column {reply + 1} (score {value})")
+
+    with open(OPENING_BOOK_PATH, "wb") as f:
+        pickle.dump({"depth": SEARCH_DEPTH, "moves": moves}, f)
+    print(f"Wrote {len(moves)} positions to {OPENING_BOOK_PATH}")
+
+if __name__ == "__main__":
+    main()
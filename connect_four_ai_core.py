@@ -1,188 +1,391 @@
 import numpy as np
-import random
-import math
+import os
+import pickle
 import streamlit as st # Streamlit is imported here but logic is used in app.py
 
+# Search kernels: the Cython extension if it has been built, else Numba
+try:
+    import _core as _kernels
+    COMPILED_KERNELS = True
+except ImportError:
+    import _core_nb as _kernels
+    COMPILED_KERNELS = _kernels.HAVE_NUMBA
+
 # --- Game Constants ---
 ROW_COUNT = 6
 COLUMN_COUNT = 7
 PLAYER_PIECE = 1
 AI_PIECE = 2
 EMPTY = 0
+DRAW = -1 # classify() result for a full board with no winner
 WINDOW_LENGTH = 4 
 
+# --- Search Scores ---
+# All scores are ints. Heuristic scores stay well below WIN_SCORE // 10, so
+# a won or lost position always outranks any evaluation, and INF_SCORE is
+# beyond every score the search can return.
+WIN_SCORE = 10_000_000
+INF_SCORE = 2 * WIN_SCORE
+
+# --- Bitboard Layout ---
+# Each player's pieces are stored in a single integer. Every column takes
+# COLUMN_HEIGHT bits (the six playable rows plus one always-empty sentinel
+# row), so cell (row, col) lives at bit `col * COLUMN_HEIGHT + row` and row 0
+# is the bottom of the board. The sentinel row stops shifted lines from
+# wrapping from the top of one column into the bottom of the next.
+#
+# A board is the list [bb_player, bb_ai, heights, key], where heights[col] is
+# the number of pieces already dropped into that column and key is the
+# position's Zobrist hash, kept up to date by drop_piece / undo_piece.
+COLUMN_HEIGHT = ROW_COUNT + 1
+COLUMN_MASK = (1 << COLUMN_HEIGHT) - 1
+# Every playable cell, i.e. what a full board looks like
+BOARD_MASK = sum(((1 << ROW_COUNT) - 1) << (col * COLUMN_HEIGHT) for col in range(COLUMN_COUNT))
+
+# --- Transposition Table ---
+# ZOBRIST[piece - 1][col][row] is XORed into the key whenever that piece is
+# dropped on or removed from (row, col). The generator is seeded so every
+# process computes the same keys.
+ZOBRIST = np.random.default_rng(20240607).integers(
+    0, 1 << 63, size=(2, COLUMN_COUNT, ROW_COUNT), dtype=np.int64).tolist()
+
+# Entries are (key, depth, flag, value, column), stored in slot key & TT_MASK,
+# so a table never holds more than 2**TT_SIZE_BITS entries. The search
+# functions take the table to use as tt; transposition_table is the default.
+TT_SIZE_BITS = 20
+TT_MASK = (1 << TT_SIZE_BITS) - 1
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+transposition_table = {}
+
+# --- Opening Book ---
+# opening.pkl holds {"depth": search depth, "moves": {(bb_player, bb_ai): (column, value)}}
+# for the AI's first two moves; regenerate it with build_opening_book.py.
+OPENING_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening.pkl")
+
+def load_opening_book(path=OPENING_BOOK_PATH):
+    """Loads the opening book, or an empty one if the file does not exist."""
+    if not os.path.exists(path):
+        return {"depth": 0, "moves": {}}
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+opening_book = load_opening_book()
+
+def book_move(board, depth):
+    """
+    Returns the opening book's (column, value) for the position, or None if
+    the position is not in the book or the book was searched at a different
+    depth (its moves are only what a search to exactly that depth returns).
+    """
+    if opening_book["depth"] != depth:
+        return None
+    return opening_book["moves"].get((board[PLAYER_PIECE - 1], board[AI_PIECE - 1]))
+
 # --- Board Helper Functions ---
 
+def create_board():
+    """Returns an empty board."""
+    return [0, 0, [0] * COLUMN_COUNT, 0]
+
+def board_from_bitboards(bb_player, bb_ai):
+    """Rebuilds a full board (heights and hash included) from the two bitboards."""
+    board = create_board()
+    for col in range(COLUMN_COUNT):
+        for row in range(ROW_COUNT):
+            bit = 1 << (col * COLUMN_HEIGHT + row)
+            if bb_player & bit:
+                drop_piece(board, row, col, PLAYER_PIECE)
+            elif bb_ai & bit:
+                drop_piece(board, row, col, AI_PIECE)
+    return board
+
+def get_piece(board, row, col):
+    """Returns the piece occupying (row, col), or EMPTY."""
+    bit = 1 << (col * COLUMN_HEIGHT + row)
+    if board[PLAYER_PIECE - 1] & bit:
+        return PLAYER_PIECE
+    if board[AI_PIECE - 1] & bit:
+        return AI_PIECE
+    return EMPTY
+
+def drop_piece(board, row, col, piece):
+    """Places a piece at (row, col); row must be the column's next open row."""
+    board[piece - 1] |= 1 << (col * COLUMN_HEIGHT + row)
+    board[2][col] += 1
+    board[3] ^= ZOBRIST[piece - 1][col][row]
+
+def undo_piece(board, row, col, piece):
+    """Removes the piece placed by drop_piece at (row, col)."""
+    board[piece - 1] ^= 1 << (col * COLUMN_HEIGHT + row)
+    board[2][col] -= 1
+    board[3] ^= ZOBRIST[piece - 1][col][row]
+
 def is_valid_location(board, col):
     """Checks if the top row of a column is empty."""
-    return board[ROW_COUNT - 1][col] == EMPTY
+    return board[2][col] < ROW_COUNT
 
 def get_next_open_row(board, col):
     """Finds the lowest empty row in the given column."""
-    for r in range(ROW_COUNT):
-        if board[r][col] == EMPTY:
-            return r
+    return board[2][col]
 
 def get_valid_locations(board):
     """Returns a list of columns where a piece can be dropped."""
-    valid_locations = []
-    for col in range(COLUMN_COUNT):
-        if is_valid_location(board, col):
-            valid_locations.append(col)
-    return valid_locations
+    heights = board[2]
+    return [col for col in range(COLUMN_COUNT) if heights[col] < ROW_COUNT]
 
 def is_winning_move(board, piece):
     """Checks for 4-in-a-row (horizontal, vertical, and both diagonals)."""
-    # Check Horizontal locations
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(ROW_COUNT):
-            if all(board[r][c + i] == piece for i in range(4)): return True
-    # Check Vertical locations
-    for c in range(COLUMN_COUNT):
-        for r in range(ROW_COUNT - 3):
-            if all(board[r + i][c] == piece for i in range(4)): return True
-    # Check Positively sloped diagonals
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(ROW_COUNT - 3):
-            if all(board[r + i][c + i] == piece for i in range(4)): return True
-    # Check Negatively sloped diagonals
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(3, ROW_COUNT):
-            if all(board[r - i][c + i] == piece for i in range(4)): return True
-    return False
-
-def is_terminal_node(board):
-    """Checks if the game is over (win or draw)."""
-    return is_winning_move(board, PLAYER_PIECE) or is_winning_move(board, AI_PIECE) or len(get_valid_locations(board)) == 0
+    return _kernels.has_four(board[piece - 1])
+
+def _mirror(bb):
+    """Reflects a bitboard left to right."""
+    mirrored = 0
+    for col in range(COLUMN_COUNT):
+        column_bits = (bb >> (col * COLUMN_HEIGHT)) & COLUMN_MASK
+        mirrored |= column_bits << ((COLUMN_COUNT - 1 - col) * COLUMN_HEIGHT)
+    return mirrored
+
+def is_symmetric(board):
+    """Checks if the board is its own left-right mirror image."""
+    return board[0] == _mirror(board[0]) and board[1] == _mirror(board[1])
+
+def made_win(board, row, col, piece):
+    """
+    Checks whether the piece just dropped at (row, col) completed a 4-in-a-row.
+    Only the lines through that cell are examined, since no other line can
+    have changed.
+    """
+    return _kernels.made_win(board[piece - 1], col * COLUMN_HEIGHT + row)
+
+def classify(board):
+    """
+    Checks if the game is over in a single pass. Returns (outcome, valid_locations)
+    where outcome is PLAYER_PIECE or AI_PIECE for a win, DRAW for a full board,
+    and EMPTY while the game goes on (the only case with valid_locations filled in).
+    """
+    if is_winning_move(board, AI_PIECE):
+        return AI_PIECE, []
+    if is_winning_move(board, PLAYER_PIECE):
+        return PLAYER_PIECE, []
+    valid_locations = get_valid_locations(board)
+    if not valid_locations:
+        return DRAW, []
+    return EMPTY, valid_locations
+
+def order_moves(valid_locations, best_col=None):
+    """
+    Orders columns for the search: best_col first (the best move found by a
+    previous, shallower search), then the rest from the center outwards.
+    """
+    moves = sorted(valid_locations, key=lambda col: abs(col - COLUMN_COUNT // 2))
+    if best_col in moves:
+        moves.remove(best_col)
+        moves.insert(0, best_col)
+    return moves
 
 # --- Heuristic Function ---
 
-def evaluate_window(window, piece):
+def _window_mask(row, col, d_row, d_col):
+    """Bit mask of the WINDOW_LENGTH cells starting at (row, col) in direction (d_row, d_col)."""
+    mask = 0
+    for i in range(WINDOW_LENGTH):
+        mask |= 1 << ((col + i * d_col) * COLUMN_HEIGHT + row + i * d_row)
+    return mask
+
+# Every possible 4-piece window on the board (24 horizontal, 21 vertical and
+# 12 + 12 diagonal), precomputed once as bitboard masks
+WINDOWS = (
+    [_window_mask(r, c, 0, 1) for r in range(ROW_COUNT) for c in range(COLUMN_COUNT - 3)]
+    + [_window_mask(r, c, 1, 0) for c in range(COLUMN_COUNT) for r in range(ROW_COUNT - 3)]
+    + [_window_mask(r, c, 1, 1) for r in range(ROW_COUNT - 3) for c in range(COLUMN_COUNT - 3)]
+    + [_window_mask(r + 3, c, -1, 1) for r in range(ROW_COUNT - 3) for c in range(COLUMN_COUNT - 3)]
+)
+WINDOW_ARRAY = np.array(WINDOWS, dtype=np.int64)
+CENTER_MASK = ((1 << ROW_COUNT) - 1) << (COLUMN_COUNT // 2 * COLUMN_HEIGHT)
+CENTER_WEIGHT = 3
+
+def evaluate_window(own_count, opp_count):
     """
-    The core heuristic evaluation: assigns a score to a 4-piece window.
-    This is the *intelligence* of your AI.
+    The core heuristic evaluation: assigns a score to a 4-piece window
+    holding own_count of our pieces and opp_count of the opponent's.
+    This is the *intelligence* of your AI. Every backend scores windows
+    from WINDOW_SCORES, which is built from this function.
     """
     score = 0
-    opp_piece = PLAYER_PIECE
-    if piece == PLAYER_PIECE:
-        opp_piece = AI_PIECE
+    empty_count = WINDOW_LENGTH - own_count - opp_count
 
-    if window.count(piece) == 4:
+    if own_count == 4:
         score += 100000 
-    elif window.count(piece) == 3 and window.count(EMPTY) == 1:
+    elif own_count == 3 and empty_count == 1:
         score += 50 
-    elif window.count(piece) == 2 and window.count(EMPTY) == 2:
+    elif own_count == 2 and empty_count == 2:
         score += 5
 
     # Strongly penalize immediate wins for the opponent
-    if window.count(opp_piece) == 3 and window.count(EMPTY) == 1:
+    if opp_count == 3 and empty_count == 1:
         score -= 4000 
         
     return score
 
+# WINDOW_SCORES[own_count * (WINDOW_LENGTH + 1) + opp_count] == evaluate_window(own_count, opp_count)
+WINDOW_SCORES = np.array([evaluate_window(own_count, opp_count)
+                          for own_count in range(WINDOW_LENGTH + 1)
+                          for opp_count in range(WINDOW_LENGTH + 1)], dtype=np.int64)
+_window_scores = WINDOW_SCORES.tolist()
+
 def score_position(board, piece):
     """
     Calculates the total score for the entire board by checking all possible 4-piece windows.
+    Each window is scored from the popcounts of its mask ANDed with both bitboards.
     """
-    score = 0
+    own = board[piece - 1]
+    opp = board[AI_PIECE - 1] if piece == PLAYER_PIECE else board[PLAYER_PIECE - 1]
+    if COMPILED_KERNELS:
+        return _kernels.score_position(own, opp, WINDOW_ARRAY, WINDOW_SCORES, CENTER_MASK, CENTER_WEIGHT)
 
-    # 1. Score Center Column (Good control heuristic)
-    center_array = list(board[:, COLUMN_COUNT // 2])
-    center_count = center_array.count(piece)
-    score += center_count * 3
-
-    # 2. Score Horizontal
-    for r in range(ROW_COUNT):
-        row_array = list(board[r, :])
-        for c in range(COLUMN_COUNT - 3):
-            window = row_array[c:c + WINDOW_LENGTH]
-            score += evaluate_window(window, piece)
-
-    # 3. Score Vertical
-    for c in range(COLUMN_COUNT):
-        col_array = list(board[:, c])
-        for r in range(ROW_COUNT - 3):
-            window = col_array[r:r + WINDOW_LENGTH]
-            score += evaluate_window(window, piece)
-
-    # 4. Score Diagonals (Positive and Negative slopes)
-    for r in range(ROW_COUNT - 3):
-        for c in range(COLUMN_COUNT - 3):
-            window_pos = [board[r + i][c + i] for i in range(WINDOW_LENGTH)]
-            score += evaluate_window(window_pos, piece)
-            
-            window_neg = [board[r + 3 - i][c + i] for i in range(WINDOW_LENGTH)]
-            score += evaluate_window(window_neg, piece)
+    # Score Center Column (Good control heuristic)
+    score = (own & CENTER_MASK).bit_count() * CENTER_WEIGHT
+
+    # Score every horizontal, vertical and diagonal window
+    for mask in WINDOWS:
+        own_bits = own & mask
+        opp_bits = opp & mask
+        if own_bits and opp_bits:
+            continue # A window holding both colors can never score
+        score += _window_scores[own_bits.bit_count() * (WINDOW_LENGTH + 1) + opp_bits.bit_count()]
 
     return score
 
 
 # --- Minimax Algorithm ---
 
-def minimax(board, depth, alpha, beta, maximizing_player):
+def negamax(board, depth, alpha, beta, piece, last_row=None, last_col=None, tt=transposition_table):
     """
-    The recursive adversarial search algorithm with Alpha-Beta Pruning.
+    The recursive adversarial search algorithm in negamax form: scores are
+    always from the point of view of piece, the side to move, so one code
+    path serves both players. Uses principal variation search on top of
+    Alpha-Beta Pruning.
+    Results are cached in the transposition table so positions reached
+    through different move orders are only searched once per depth.
+    (last_row, last_col) is the cell just played by the other side. Only
+    that move can have ended the game, so it is the only win checked for;
+    at the root, where it is None, the whole board is classified instead.
     """
-    valid_locations = get_valid_locations(board)
-    is_terminal = is_terminal_node(board)
-
-    if depth == 0 or is_terminal:
-        if is_terminal:
-            if is_winning_move(board, AI_PIECE):
-                # AI wins (return a very large score)
-                return (None, 100000000000000)
-            elif is_winning_move(board, PLAYER_PIECE):
-                # Player wins (return a very large negative score)
-                return (None, -100000000000000)
-            else: 
-                # Draw or Board Full
-                return (None, 0)
-        else: 
-            # Depth limit reached: use the heuristic
-            return (None, score_position(board, AI_PIECE))
-
-    # Maximizing Player (AI)
-    if maximizing_player:
-        value = -math.inf
-        column = random.choice(valid_locations) 
-
-        for col in valid_locations:
-            row = get_next_open_row(board, col)
-            temp_board = board.copy()
-            temp_board[row][col] = AI_PIECE
-            
-            # Recursively call minimax for the opponent (False)
-            new_score = minimax(temp_board, depth - 1, alpha, beta, False)[1]
-            
-            if new_score > value:
-                value = new_score
-                column = col
-            
-            alpha = max(alpha, value)
-            if alpha >= beta:
-                break # Alpha-Beta Pruning
-                
-        return column, value
-
-    # Minimizing Player (Human)
-    else: 
-        value = math.inf
-        column = random.choice(valid_locations)
-        
-        for col in valid_locations:
-            row = get_next_open_row(board, col)
-            temp_board = board.copy()
-            temp_board[row][col] = PLAYER_PIECE
-
-            # Recursively call minimax for the AI (True)
-            new_score = minimax(temp_board, depth - 1, alpha, beta, True)[1]
-
-            if new_score < value:
-                value = new_score
-                column = col
-                
-            beta = min(beta, value)
+    if last_row is not None and made_win(board, last_row, last_col,
+                                         PLAYER_PIECE if piece == AI_PIECE else AI_PIECE):
+        # Side to move has lost (return a very large negative score)
+        return (None, -WIN_SCORE)
+
+    key = board[3]
+    alpha_orig, beta_orig = alpha, beta
+    best_col = None
+    entry = tt.get(key & TT_MASK)
+    if entry is not None and entry[0] == key:
+        best_col = entry[4]
+        if entry[1] >= depth:
+            _, _, flag, value, column = entry
+            if flag == EXACT:
+                return column, value
+            if flag == LOWER_BOUND:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
             if alpha >= beta:
-                break # Alpha-Beta Pruning
-                
-        return column, value
\ No newline at end of file
+                return column, value
+
+    column, value = _search_node(board, depth, alpha, beta, piece, best_col, last_row, tt)
+    _store_result(tt, key, depth, alpha_orig, beta_orig, column, value)
+    return column, value
+
+def search_root(board, depth, piece, tt=transposition_table):
+    """
+    Searches the current position with a full window and returns (column, value).
+    When the board is left-right symmetric, columns right of the center are
+    skipped: they score exactly the same as their mirror images.
+    """
+    key = board[3]
+    entry = tt.get(key & TT_MASK)
+    best_col = entry[4] if entry is not None and entry[0] == key else None
+    root_moves = None
+    if is_symmetric(board):
+        root_moves = range(COLUMN_COUNT // 2 + 1)
+
+    column, value = _search_node(board, depth, -INF_SCORE, INF_SCORE, piece, best_col, None, tt, root_moves)
+    _store_result(tt, key, depth, -INF_SCORE, INF_SCORE, column, value)
+    return column, value
+
+def _store_result(tt, key, depth, alpha_orig, beta_orig, column, value):
+    """Stores a search result in the transposition table, flagged against the window it was searched with."""
+    if value <= alpha_orig:
+        flag = UPPER_BOUND
+    elif value >= beta_orig:
+        flag = LOWER_BOUND
+    else:
+        flag = EXACT
+    slot = key & TT_MASK
+    entry = tt.get(slot)
+    if entry is None or depth >= entry[1]:
+        tt[slot] = (key, depth, flag, value, column)
+
+def _search_node(board, depth, alpha, beta, piece, best_col, last_row, tt, root_moves=None):
+    """
+    Searches one node of the negamax tree; see negamax. Children are tried
+    in order_moves order, starting with best_col from an earlier search.
+    root_moves, if given, restricts which columns are tried (see search_root).
+    """
+    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+    if last_row is None:
+        # Root: nothing is known about the position yet
+        outcome, _ = classify(board)
+        if outcome == piece:
+            # Side to move has won (return a very large score)
+            return (None, WIN_SCORE)
+        elif outcome == opp_piece:
+            # Side to move has lost (return a very large negative score)
+            return (None, -WIN_SCORE)
+        elif outcome == DRAW:
+            return (None, 0)
+    elif (board[0] | board[1]) == BOARD_MASK:
+        # Draw or Board Full (negamax has already ruled out a win)
+        return (None, 0)
+
+    if depth == 0:
+        # Depth limit reached: use the heuristic, which is always from the AI's side
+        score = score_position(board, AI_PIECE)
+        return (None, score if piece == AI_PIECE else -score)
+
+    valid_locations = get_valid_locations(board)
+
+    if root_moves is not None:
+        valid_locations = [col for col in valid_locations if col in root_moves]
+
+    value = -INF_SCORE
+    # Default to the most central column (deterministic, and the strongest guess)
+    column = min(valid_locations, key=lambda col: abs(col - COLUMN_COUNT // 2))
+
+    for i, col in enumerate(order_moves(valid_locations, best_col)):
+        row = get_next_open_row(board, col)
+        drop_piece(board, row, col, piece)
+        try:
+            if i == 0:
+                # Principal variation: search with the full window
+                new_score = -negamax(board, depth - 1, -beta, -alpha, opp_piece, row, col, tt)[1]
+            else:
+                # Scout with a null window, re-searching only if it fails high
+                new_score = -negamax(board, depth - 1, -alpha - 1, -alpha, opp_piece, row, col, tt)[1]
+                if alpha < new_score < beta:
+                    new_score = -negamax(board, depth - 1, -beta, -new_score, opp_piece, row, col, tt)[1]
+        finally:
+            undo_piece(board, row, col, piece)
+
+        if new_score > value:
+            value = new_score
+            column = col
+
+        alpha = max(alpha, value)
+        if alpha >= beta:
+            break # Alpha-Beta Pruning
+
+    return column, value
@@ -1,9 +1,8 @@
-import numpy as np
 import streamlit as st
-import math
 from connect_four_ai_core import (
-    minimax, is_valid_location, get_next_open_row, get_valid_locations, 
-    is_winning_move, AI_PIECE, PLAYER_PIECE, EMPTY, ROW_COUNT, COLUMN_COUNT
+    search_root, book_move, board_from_bitboards,
+    create_board, drop_piece, get_piece, is_valid_location, get_next_open_row,
+    classify, AI_PIECE, PLAYER_PIECE, EMPTY, DRAW, ROW_COUNT, COLUMN_COUNT
 )
 
 # --- Streamlit Application ---
@@ -28,10 +27,11 @@ def draw_board(board):
         # Reset button
         if st.button('Play Again', key='reset_button'):
             # Reset all session state variables
-            st.session_state.board = np.zeros((ROW_COUNT, COLUMN_COUNT), dtype=int)
+            st.session_state.board = create_board()
             st.session_state.game_over = False
             st.session_state.turn = PLAYER_PIECE
             st.session_state.winner = EMPTY
+            st.session_state.tt = {}
             st.rerun()
         return
 
@@ -48,7 +48,7 @@ def draw_board(board):
             def player_move_callback(col=c):
                 if st.session_state.turn == PLAYER_PIECE and is_valid_location(st.session_state.board, col):
                     row = get_next_open_row(st.session_state.board, col)
-                    st.session_state.board[row][col] = PLAYER_PIECE
+                    drop_piece(st.session_state.board, row, col, PLAYER_PIECE)
                     st.session_state.turn = AI_PIECE # Switch turn
                     
             disabled = not is_valid_location(board, c) or st.session_state.turn == AI_PIECE # Disable if full or if it's AI's turn
@@ -57,7 +57,7 @@ def draw_board(board):
 
             # Display the board pieces (from top to bottom)
             for r in range(ROW_COUNT - 1, -1, -1):
-                piece = board[r][c]
+                piece = get_piece(board, r, c)
                 if piece == PLAYER_PIECE:
                     # Blue circle for Human player
                     st.markdown('<p style="font-size: 40px; text-align: center; color: blue;">●</p>', unsafe_allow_html=True)
@@ -70,26 +70,46 @@ def draw_board(board):
 
 def check_game_state(board):
     """Check for win conditions after a move."""
-    if is_winning_move(board, PLAYER_PIECE):
+    outcome, _ = classify(board)
+    if outcome == PLAYER_PIECE:
         st.session_state.game_over = True
         st.session_state.winner = PLAYER_PIECE
-    elif is_winning_move(board, AI_PIECE):
+    elif outcome == AI_PIECE:
         st.session_state.game_over = True
         st.session_state.winner = AI_PIECE
-    elif len(get_valid_locations(board)) == 0:
+    elif outcome == DRAW:
         st.session_state.game_over = True
         st.session_state.winner = EMPTY # Draw
 
+@st.cache_data(show_spinner=False)
+def _search(bb_player, bb_ai, depth, _tt):
+    """
+    Runs the AI's search for the position given by the two bitboards, or
+    looks it up in the opening book. Cached so Streamlit reruns never repeat
+    the search for a position; the leading underscore keeps the
+    transposition table _tt out of the cache key.
+    """
+    board = board_from_bitboards(bb_player, bb_ai)
+    book = book_move(board, depth)
+    if book is not None:
+        return book
+
+    # Iterative deepening: each shallower search fills the transposition
+    # table with best moves that order the next, deeper one
+    for d in range(1, depth + 1):
+        col, minimax_score = search_root(board, d, AI_PIECE, _tt)
+    return col, minimax_score
+
 def ai_turn_logic():
     """Executes the AI's Minimax move."""
     
     with st.spinner(f"🤖 AI is evaluating {2 * SEARCH_DEPTH} half-moves..."):
-        # Call the Minimax search function from the core logic file
-        col, minimax_score = minimax(st.session_state.board, SEARCH_DEPTH, -math.inf, math.inf, True) 
+        board = st.session_state.board
+        col, minimax_score = _search(board[PLAYER_PIECE - 1], board[AI_PIECE - 1], SEARCH_DEPTH, st.session_state.tt)
 
     if col is not None and is_valid_location(st.session_state.board, col):
         row = get_next_open_row(st.session_state.board, col)
-        st.session_state.board[row][col] = AI_PIECE
+        drop_piece(st.session_state.board, row, col, AI_PIECE)
         st.session_state.turn = PLAYER_PIECE # Switch back to human
         st.rerun() 
     else:
@@ -103,13 +123,16 @@ def main():
 
     # --- Initialize Session State (Critical for Streamlit) ---
     if 'board' not in st.session_state:
-        st.session_state.board = np.zeros((ROW_COUNT, COLUMN_COUNT), dtype=int)
+        st.session_state.board = create_board()
     if 'game_over' not in st.session_state:
         st.session_state.game_over = False
     if 'turn' not in st.session_state:
         st.session_state.turn = PLAYER_PIECE # Human starts
     if 'winner' not in st.session_state:
         st.session_state.winner = EMPTY
+    if 'tt' not in st.session_state:
+        # Transposition table, kept across turns so later searches start warm
+        st.session_state.tt = {}
         
     # --- Game Flow ---
     draw_board(st.session_state.board)
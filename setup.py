@@ -0,0 +1,8 @@
+from setuptools import setup
+from Cython.Build import cythonize
+
+# Builds the optional _core C extension: python setup.py build_ext --inplace
+setup(
+    name="connect_four",
+    ext_modules=cythonize("_core.pyx"),
+)